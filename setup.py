@@ -68,5 +68,5 @@ setup(
         "requests",
         "packaging",
     ],
-    extras_require={"image_resolve_caching": ["requests_cache>=1.2"]},
+    extras_require={"image_resolve_caching": ["requests_cache>=1.2"], "fast_json": ["orjson"]},
 )
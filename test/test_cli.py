@@ -3,7 +3,17 @@
 # License: GPL-2.0+ <http://spdx.org/licenses/GPL-2.0+>
 # See the LICENSE file for more details on Licensing
 
-""" This module is for testing the behaviour of cli functions."""
+"""This module is for testing the behaviour of cli functions."""
+
+import argparse
+import logging
+import os
+import struct
+import time
+
+import pytest
+
+from testcloud import cli
 
 
 class TestCLI:
@@ -12,3 +22,155 @@ class TestCLI:
 
     def test_main(self):
         pass
+
+
+class TestStreamLogLevel(object):
+    def test_known_level(self, monkeypatch):
+        monkeypatch.setenv("TESTCLOUD_LOG_LEVEL", "info")
+        assert cli._stream_log_level() == "INFO"
+
+    def test_unknown_level_falls_back_to_default(self, monkeypatch):
+        monkeypatch.setenv("TESTCLOUD_LOG_LEVEL", "verbose")
+        monkeypatch.setattr(cli.sys.stderr, "isatty", lambda: False)
+        assert cli._stream_log_level() == logging.WARNING
+
+    def test_unknown_level_is_reported_once_logging_is_configured(self, monkeypatch, caplog):
+        monkeypatch.setenv("TESTCLOUD_LOG_LEVEL", "verbose")
+        monkeypatch.setattr(cli.sys, "argv", ["testcloud", "image", "list"])
+        parser = argparse.ArgumentParser()
+        monkeypatch.setattr(parser, "parse_args", lambda: argparse.Namespace(func=lambda args: None))
+        monkeypatch.setattr(cli, "_build_argparser", lambda: parser)
+        # Number of records logged by the time the logging gets configured
+        configured = []
+        monkeypatch.setattr(cli, "_configure_logging", lambda level: configured.append(len(caplog.records)))
+
+        cli.main()
+
+        warnings = [i for i, record in enumerate(caplog.records) if "Unknown TESTCLOUD_LOG_LEVEL 'verbose'" in record.getMessage()]
+        assert warnings and warnings[0] >= configured[0]
+
+
+class TestArgparser(object):
+    """The commands' arguments are added lazily by _LazySubParsersAction, which builds on argparse internals"""
+
+    @pytest.mark.parametrize(
+        "argv, func",
+        [
+            (["list"], cli._list_instance),
+            (["start", "vm", "--timeout", "5"], cli._start_instance),
+            (["stop", "vm"], cli._stop_instance),
+            (["force-off", "vm"], cli._stop_instance),
+            (["shutdown", "vm"], cli._shutdown_instance),
+            (["remove", "vm", "-f"], cli._remove_instance),
+            (["destroy", "vm"], cli._remove_instance),
+            (["clean"], cli._clean_instances),
+            (["reboot", "vm"], cli._reboot_instance),
+            (["reset", "vm"], cli._reset_instance),
+            (["create", "fedora:40", "--ram", "2048"], cli._create_instance),
+            (["image", "list"], cli._list_image),
+            (["image", "remove", "img"], cli._remove_image),
+            (["image", "destroy", "img"], cli._remove_image),
+            (["image", "download", "fedora:40", "-d", "/tmp"], cli._download_image),
+        ],
+    )
+    def test_parse_args(self, argv, func):
+        args = cli._build_argparser.__wrapped__().parse_args(argv)
+        assert args.func is func
+
+    def test_parsed_values(self):
+        parser = cli._build_argparser.__wrapped__()
+
+        args = parser.parse_args(["-c", "qemu:///session", "create", "fedora:40", "--ram", "2048"])
+        assert (args.connection, args.url, args.ram, args.disksize) == ("qemu:///session", "fedora:40", 2048, -1)
+
+        args = parser.parse_args(["image", "download", "fedora:40", "-d", "/tmp"])
+        assert (args.url, args.dest_path) == ("fedora:40", "/tmp")
+
+    def test_only_the_selected_command_is_populated(self):
+        parser = cli._build_argparser.__wrapped__()
+        subparsers = next(action for action in parser._actions if isinstance(action, cli._LazySubParsersAction))
+
+        parser.parse_args(["list"])
+
+        assert set(subparsers.choices.populators) == set(cli._COMMANDS) - {"list"}
+
+    def test_get_argparser_populates_all_commands(self, monkeypatch):
+        monkeypatch.setattr(cli, "_build_argparser", cli._build_argparser.__wrapped__)
+        parser = cli.get_argparser()
+        subparsers = next(action for action in parser._actions if isinstance(action, cli._LazySubParsersAction))
+
+        assert subparsers.choices.populators == {}
+        # Plain dict lookups, which don't populate anything on their own
+        assert "--ram" in dict.__getitem__(subparsers.choices, "create").format_help()
+        assert "download" in dict.__getitem__(subparsers.choices, "image").format_help()
+
+    def test_command_help(self, capsys):
+        with pytest.raises(SystemExit) as exc_info:
+            cli._build_argparser.__wrapped__().parse_args(["create", "--help"])
+
+        assert exc_info.value.code == 0
+        out = capsys.readouterr().out
+        assert out.startswith("usage:") and "--ram" in out and "--disksize" in out
+
+    def test_invalid_choice(self, capsys):
+        for argv in (["bogus"], ["image", "bogus"]):
+            with pytest.raises(SystemExit) as exc_info:
+                cli._build_argparser.__wrapped__().parse_args(argv)
+
+            assert exc_info.value.code == 2
+            assert "invalid choice: 'bogus'" in capsys.readouterr().err
+
+
+class TestReadBackingFile(object):
+    def test_qcow2_header(self, tmpdir):
+        ref_backing = "/var/lib/testcloud/backingstores/image.qcow2"
+        ref_path = str(tmpdir.join("instance-local.qcow2"))
+        with open(ref_path, "wb") as qcow:
+            qcow.write(struct.pack(">IIQI", cli.QCOW2_MAGIC, 3, 512, len(ref_backing)))
+            qcow.write(b"\0" * (512 - 20))
+            qcow.write(ref_backing.encode())
+
+        assert cli._read_backing_file(ref_path) == ref_backing
+
+    def test_missing_qemu_img(self, tmpdir, monkeypatch):
+        ref_path = str(tmpdir.join("not-a-qcow2.img"))
+        with open(ref_path, "wb") as image:
+            image.write(b"\0" * 512)
+
+        def missing_binary(*args, **kwargs):
+            raise FileNotFoundError(2, "No such file or directory", "qemu-img")
+
+        monkeypatch.setattr(cli.subprocess, "run", missing_binary)
+
+        assert cli._read_backing_file(ref_path) is None
+
+
+class TestCleanBackingstore(object):
+    def test_removes_oldest_unused_images(self, tmpdir, monkeypatch):
+        store = tmpdir.mkdir("backingstores")
+        old = time.time() - 3 * 86400
+        for name, age in (("oldest.qcow2", 2), ("older.qcow2.part", 1), ("used.qcow2", 3), ("notes.txt", 3)):
+            fpath = str(store.join(name))
+            # Sparse files larger than the 1 GiB cap, so every candidate gets removed
+            with open(fpath, "wb") as image:
+                image.truncate(2 * 1024 * 1024 * 1024)
+            os.utime(fpath, (old - age, old - age))
+        store.join("fresh.qcow2").write("x")
+
+        monkeypatch.setattr(cli.config_data, "STORE_DIR", str(store))
+        monkeypatch.setattr(cli.config_data, "BACKINGSTORE_SIZE", 1)
+        monkeypatch.setattr(cli, "_get_used_images", lambda args, instances: {str(store.join("used.qcow2"))})
+
+        cli._clean_backingstore(None, [])
+
+        assert sorted(os.listdir(str(store))) == ["fresh.qcow2", "notes.txt", "used.qcow2"]
+
+
+class TestCreateInstance(object):
+    def test_invalid_backingstore_size_is_not_fatal(self, monkeypatch):
+        monkeypatch.setattr(cli.config_data, "BACKINGSTORE_SIZE", "10G")
+        args = argparse.Namespace(name="test", url=None)
+
+        # Gets past the backingstore cleanup to the missing url check
+        with pytest.raises(SystemExit):
+            cli._create_instance(args)
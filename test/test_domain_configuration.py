@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024, Red Hat, Inc.
+# License: GPL-2.0+ <http://spdx.org/licenses/GPL-2.0+>
+# See the LICENSE file for more details on Licensing
+
+"""This module is for testing the domain XML generation."""
+
+from testcloud import domain_configuration
+
+
+class TestStorageDeviceNames(object):
+    def test_names_restart_for_each_domain(self):
+        """Disk names only depend on the disk's position in its own domain"""
+
+        for name in ("first", "second"):
+            domain = domain_configuration.DomainConfiguration(name)
+            domain.storage_devices = [domain_configuration.QCow2StorageDevice("/disk{}.qcow2".format(i)) for i in range(28)]
+            domain.generate_storage_devices()
+
+            names = [device.host_device_path for device in domain.storage_devices]
+            assert names[:2] == ["vda", "vdb"]
+            assert names[25:] == ["vdz", "vdaa", "vdab"]
+
+
+class TestGenerate(object):
+    def test_no_blank_lines(self, monkeypatch):
+        """Empty elements in the template don't leave blank or whitespace-only lines behind"""
+
+        domain = domain_configuration.DomainConfiguration("test")
+        domain.cpu_count = 1
+        domain.memory_size = 1024
+        domain.system_architecture = domain_configuration.X86_64ArchitectureConfiguration()
+        domain.network_configuration = domain_configuration.SystemNetworkConfiguration("52:54:00:00:00:01")
+        monkeypatch.setattr(domain, "get_emulator", lambda: "/usr/bin/qemu-kvm")
+
+        domain_xml = domain.generate()
+
+        assert "<qemu:commandline />" in domain_xml
+        assert all(line.strip() for line in domain_xml.splitlines())
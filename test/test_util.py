@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024, Red Hat, Inc.
+# License: GPL-2.0+ <http://spdx.org/licenses/GPL-2.0+>
+# See the LICENSE file for more details on Licensing
+
+"""This module is for testing the helper functions in util."""
+
+import functools
+import inspect
+import threading
+
+import pytest
+
+from testcloud import exceptions
+from testcloud import util
+from testcloud.distro_utils import misc
+
+
+class TestGetImageUrls(object):
+    def setup_method(self, method):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def fake_get_image_url(self, distro_str, arch="x86_64", verify=False, additional_handles={}):
+        with self.lock:
+            self.calls.append(distro_str)
+        if distro_str == "bogus":
+            raise exceptions.TestcloudImageError
+        return "https://example.com/{}/{}.qcow2".format(arch, distro_str)
+
+    def test_resolves_each_handle_once(self, monkeypatch):
+        monkeypatch.setattr(util, "get_image_url", self.fake_get_image_url)
+
+        urls = util.get_image_urls(["fedora:40", "debian", "fedora:40"], arch="aarch64")
+
+        assert urls == {
+            "fedora:40": "https://example.com/aarch64/fedora:40.qcow2",
+            "debian": "https://example.com/aarch64/debian.qcow2",
+        }
+        assert sorted(self.calls) == ["debian", "fedora:40"]
+
+    def test_failing_handle_raises(self, monkeypatch):
+        monkeypatch.setattr(util, "get_image_url", self.fake_get_image_url)
+
+        with pytest.raises(exceptions.TestcloudImageError):
+            util.get_image_urls(["fedora:40", "bogus"])
+
+    def test_no_handles(self):
+        assert util.get_image_urls([]) == {}
+
+
+class TestGetImageUrl(object):
+    def test_stream_list_changed_on_the_fly(self, monkeypatch):
+        monkeypatch.setattr(util, "get_coreos_image_url", lambda version, arch: "https://example.com/{}.qcow2.xz".format(version))
+        monkeypatch.setattr(util.config_data, "STREAM_LIST", ["stable", "rawhide-coreos"])
+        # Drop the patterns compiled with the fake resolver once done
+        monkeypatch.setattr(util, "_supported_handles", functools.lru_cache(maxsize=None)(util._supported_handles.__wrapped__))
+
+        assert util.get_image_url("coreos:rawhide-coreos") == "https://example.com/rawhide-coreos.qcow2.xz"
+
+        monkeypatch.setattr(util.config_data, "STREAM_LIST", ["stable"])
+        with pytest.raises(exceptions.TestcloudImageError):
+            util.get_image_url("coreos:rawhide-coreos")
+
+
+class TestTtlCache(object):
+    def setup_method(self, method):
+        self.now = 0
+        self.calls = []
+
+    def resolve(self, version):
+        self.calls.append(version)
+        return version
+
+    def test_expired_entries_are_dropped(self, monkeypatch):
+        monkeypatch.setattr(misc.time, "monotonic", lambda: self.now)
+        resolve = misc.ttl_cache(10)(self.resolve)
+        cache = inspect.getclosurevars(resolve).nonlocals["cache"]
+
+        resolve("a")
+        resolve("b")
+        assert resolve("a") == "a"
+        assert self.calls == ["a", "b"]
+
+        self.now = 20
+        resolve("c")
+        assert list(cache) == [(("c",), ())]
+        assert resolve("a") == "a"
+        assert self.calls == ["a", "b", "c", "a"]
+
+    def test_clear_url_caches(self):
+        resolve = misc.ttl_cache(10)(self.resolve)
+
+        resolve("a")
+        misc.clear_url_caches()
+        resolve("a")
+
+        assert self.calls == ["a", "a"]
@@ -8,29 +8,28 @@ This is the primary user entry point for testcloud
 """
 
 import argparse
+import functools
+import json
 import logging
 import os
 import platform
 import random
 import re
+import struct
 import subprocess
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
-import libvirt
-
-from testcloud import config, image, instance
-from testcloud.domain_configuration import _get_default_domain_conf
+from testcloud import config
 from testcloud.exceptions import TestcloudImageError, TestcloudInstanceError, TestcloudPermissionsError
-from testcloud.util import get_image_url
 from testcloud.workarounds import Workarounds
 
-config_data = config.get_config()
+# testcloud.image and testcloud.instance pull in libvirt, peewee and requests, the handlers import them
+# only when they run, so that help and argument errors don't pay for that
 
-# Only log to a file when specifically configured to
-if config_data.LOG_FILE is not None:
-    logging.basicConfig(filename=config_data.LOG_FILE, level=logging.DEBUG)
+config_data = config.get_config()
 
 log = logging.getLogger("testcloud")
 log.addHandler(logging.NullHandler())  # this is needed when running in library mode
@@ -39,9 +38,41 @@ if not config_data.DEBUG:
     log.setLevel(logging.INFO)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+# Argument defaults, looked up once
+_BOOT_TIMEOUT = config_data.BOOT_TIMEOUT
+_VCPUS = config_data.VCPUS
+_ARCH = platform.machine()
+# Detailed connection hints make sense only for the default USER_DATA
+_USER_DATA_ALTERED = config.DEFAULT_USER_DATA_HEADER not in config_data.USER_DATA
+
+# Help texts shared by several commands
+_HELP_TIMEOUT = "Time (in seconds) to wait for boot to complete before completion, setting to 0 disables all waiting."
+_HELP_URL = """
+    URL to qcow2 image or distro:release string is required.
+    Examples of some known distro:release pairs:
+    - fedora:rawhide (latest compose), fedora:33, fedora:latest (latest Fedora GA image)
+    - fedora:qa-matrix (image from https://fedoraproject.org/wiki/Test_Results:Current_Cloud_Test )
+    - centos:XX (eg. centos:8, centos:latest)
+    - centos-stream:XX (eg. centos-stream:8, centos-stream:latest)
+    - ubuntu:release_name (eg. ubuntu:focal, ubuntu:latest)
+    - debian:release_name/release_number (eg. debian:11, debian:sid, debian:latest)
+    """
+
 description = """Testcloud is a small wrapper program designed to quickly and
 simply boot images designed for cloud systems."""
 
+_SEPARATOR = "-" * 80
+
+# "QFI\xfb", see https://gitlab.com/qemu-project/qemu/-/blob/master/docs/interop/qcow2.txt
+QCOW2_MAGIC = 0x514649FB
+
+# Image url patterns telling which kind of instance gets created
+_COREOS_RE = re.compile("coreos|rhcos")
+# CentOS .box files don't have cloud-init at all
+_CENTOS_VAGRANT_RE = re.compile(r"centos-(.*)-vagrant-(.*)")
+# Fedora .box files have cloud-init masked
+_FEDORA_VAGRANT_RE = re.compile(r"fedora-cloud-base-vagrant-(.*)")
+
 
 ################################################################################
 # instance handling functions
@@ -51,32 +82,18 @@ simply boot images designed for cloud systems."""
 def _handle_connection_tip(ip, port, vagrant=False):
     """
     Prints hint how to connect to the vm
-    Prints detailed help for default config_data.USER_DATA and just the basic one for altered configurations
+    Logs in as cloud-user with the default config_data.USER_DATA, and just to the ip for altered configurations
     """
-    config_altered = False
-    kind = ""
-
-    if "#cloud-config\nssh_pwauth: true\npassword: ${password}\nchpasswd:\n  expire: false\n" not in config_data.USER_DATA:
-        config_altered = True
+    login = ip if _USER_DATA_ALTERED else f"cloud-user@{ip}"
 
-    print("-" * 80)
-    if config_altered:
-        print("To connect to the VM, use the following command:")
-        if port == 22:
-            print("ssh -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null %s" % ip)
-        else:
-            print("ssh -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null %s -p %d" % (ip, port))
+    print(_SEPARATOR)
+    print("To connect to the VM, use the following command:")
+    if port == 22:
+        print(f"ssh -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null {login}")
     else:
-        if kind in ["Fedora", "CentOS", "Ubuntu", "Debian"]:
-            print("To connect to the VM, use the following command (password is '%s'):" % config_data.PASSWORD)
-        elif kind == "CoreOS":
-            print("To connect to the VM, use the following command :")
-        if port == 22:
-            print("ssh -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null cloud-user@%s" % ip)
-        else:
-            print("ssh -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null cloud-user@%s -p %d" % (ip, port))
+        print(f"ssh -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null {login} -p {port}")
 
-    print("-" * 80)
+    print(_SEPARATOR)
     if vagrant:
         print(
             "Due to limited support for images without cloud-init pre installed,"
@@ -100,35 +117,63 @@ def _list_instance(args):
 
     :param args: args from argparser
     """
+    from testcloud import instance
+
     instances = instance.list_instances()
 
-    print("{!s:<16} {!s:^30} {!s:<10}    {!s:<10}".format("Name", "IP", "SSH Port", "State"))
-    print("-" * 80)
+    lines = ["{!s:<16} {!s:^30} {!s:<10}    {!s:<10}".format("Name", "IP", "SSH Port", "State"), _SEPARATOR]
+    # Running first, and everything else
+    running, other = [], []
     for inst in instances:
-        # Running first
-        if inst["state"] == "running":
-            print("{!s:<27} {!s:^16} {!s:^12}  {!s:^14}".format(inst["name"], inst["ip"], inst["port"], inst["state"]))
-    # And everything else
-    for inst in instances:
-        if inst["state"] != "running":
-            print("{!s:<27} {!s:^16} {!s:^12}  {!s:^14}".format(inst["name"], inst["ip"], inst["port"], inst["state"]))
+        (running if inst["state"] == "running" else other).append(inst)
+    for inst in running + other:
+        lines.append(f"{inst['name']!s:<27} {inst['ip']!s:^16} {inst['port']!s:^12}  {inst['state']!s:^14}")
 
-    print("")
+    # Write the whole listing at once
+    sys.stdout.write("\n".join(lines) + "\n\n")
 
 
-def _get_used_images(args):
+def _read_backing_file(path):
+    """
+    Returns the backing file of a qcow2 image, read directly from the qcow2 header.
+    Falls back to qemu-img if the header can't be parsed, returns None if that fails too.
+    """
+    try:
+        with open(path, "rb") as qcow:
+            # magic, version, backing_file_offset, backing_file_size
+            magic, _, offset, size = struct.unpack(">IIQI", qcow.read(20))
+            if magic != QCOW2_MAGIC:
+                raise ValueError("%s is not a qcow2 image" % path)
+            qcow.seek(offset)
+            return qcow.read(size).decode()
+    except (OSError, ValueError, struct.error):
+        try:
+            info = subprocess.run(["qemu-img", "info", "--output=json", path], capture_output=True, check=True)
+            return json.loads(info.stdout).get("backing-filename", "")
+        except (subprocess.CalledProcessError, json.JSONDecodeError, OSError):
+            # OSError covers qemu-img not being installed at all
+            return None
+
+
+def _get_used_images(args, instances=None):
     """
     Gets the list of images currently in use by any other instance
+
+    :param instances: already fetched :py:func:`instance.list_instances` result, fetched if not provided
     """
-    instances = instance.list_instances()
+    if instances is None:
+        from testcloud import instance
+
+        instances = instance.list_instances()
+
+    # get images in use by any instance, qemu-img fallbacks are I/O bound so run them side by side
+    paths = [os.path.join(config_data.DATA_DIR, "instances", inst["name"], inst["name"] + "-local.qcow2") for inst in instances]
+    with ThreadPoolExecutor(max_workers=min(8, len(paths) or 1)) as executor:
+        image_names = list(executor.map(_read_backing_file, paths))
 
-    # get images in use by any instance
     images_in_use = set()
-    for inst in instances:
-        path = os.path.join(config_data.DATA_DIR, "instances", inst["name"], inst["name"] + "-local.qcow2")
-        command = "qemu-img info %s | grep 'backing file: '" % path
-        image_name = subprocess.check_output(command, shell=True).decode().strip().replace("backing file: ", "")
-        if image_name.endswith(".qcow2") or image_name.endswith(".img"):
+    for image_name in image_names:
+        if image_name and image_name.endswith((".qcow2", ".img")):
             images_in_use.add(image_name)
         else:
             # If we failed to obtain lock for image, bail out and do not remove anything later on
@@ -137,9 +182,19 @@ def _get_used_images(args):
     return images_in_use
 
 
-def _clean_backingstore(args):
+def _remove_backingstore_file(fpath):
+    try:
+        os.remove(fpath)
+    except FileNotFoundError:
+        # Somebody else was faster, which is fine
+        pass
+
+
+def _clean_backingstore(args, instances=None):
     """
     Removes oldest files from config_data.STORE_DIR if the directory ocupies more than BACKINGSTORE_SIZE
+
+    :param instances: already fetched :py:func:`instance.list_instances` result, fetched if not provided
     """
     max_size = int(config_data.BACKINGSTORE_SIZE) * 1024 * 1024 * 1024
 
@@ -148,14 +203,17 @@ def _clean_backingstore(args):
         return
 
     # Bail erly if there are any running instances
-    instances = instance.list_instances()
+    if instances is None:
+        from testcloud import instance
+
+        instances = instance.list_instances()
     running_instances = set()
     for inst in instances:
         if inst["state"] == "running":
             running_instances.add(inst["name"])
     if len(running_instances) > 0:
         print("")
-        log.warn("Not proceeding with backingstore cleanup because there are some testcloud instances running.")
+        log.warning("Not proceeding with backingstore cleanup because there are some testcloud instances running.")
         print("You can fix this by following command(s):")
         for inst in running_instances:
             print("testcloud instance stop %s" % inst)
@@ -163,7 +221,7 @@ def _clean_backingstore(args):
         return
 
     try:
-        images_in_use = _get_used_images(args)
+        images_in_use = _get_used_images(args, instances)
     except subprocess.CalledProcessError:
         # Rather not clean anything if we can't be sure it's not used...
         print("Not proceeding with backingstore cleanup due to errors... Are all testcloud instances stopped?")
@@ -171,31 +229,29 @@ def _clean_backingstore(args):
 
     # create a list of all files in the `store_dir`
     files_by_mtime = []
-    for file in os.listdir(config_data.STORE_DIR):
-        fpath = os.path.join(config_data.STORE_DIR, file)
-        ftime = os.path.getmtime(fpath)
-        # Don't touch files created in the last 24 hours,
-        if ftime >= (time.time() - 86400):
-            continue
-        # Don't touch images in use by any instance
-        if file in images_in_use:
-            continue
-        # Touch only .qcow2 and .qcow2.part files
-        if os.path.splitext(fpath)[1] not in ("qcow2", ".qcow2.part"):
-            continue
-        files_by_mtime.append((ftime, os.path.getsize(fpath), fpath))
-
-    # sort descending by mtime
-    files_by_mtime.sort(reverse=True)
+    cutoff = time.time() - 86400
+    with os.scandir(config_data.STORE_DIR) as entries:
+        for entry in entries:
+            # Touch only .qcow2 and .qcow2.part files
+            if not entry.name.endswith((".qcow2", ".qcow2.part")):
+                continue
+            # Don't touch images in use by any instance, backing files are usually recorded with full path
+            if entry.name in images_in_use or entry.path in images_in_use:
+                continue
+            stat = entry.stat()
+            # Don't touch files created in the last 24 hours,
+            if stat.st_mtime >= cutoff:
+                continue
+            files_by_mtime.append((stat.st_mtime, stat.st_size, entry.path))
+
+    # sort ascending by mtime, so the newest files can be popped off the end
+    files_by_mtime.sort()
 
     # remove files from the list before either:
     #  1) the sum of the removed files' sizes is larger than the BACKINGSTORE_SIZE
     #  2) you remove all the files from the list
-    while True:
-        try:
-            _, size, _ = files_by_mtime[0]
-        except IndexError:
-            break
+    while files_by_mtime:
+        _, size, _ = files_by_mtime[-1]
 
         # remove the current file's size from the allocated lot
         max_size -= size
@@ -205,82 +261,113 @@ def _clean_backingstore(args):
             break
 
         # keep the file off of the 'remove me later on' list
-        files_by_mtime.pop(0)
+        files_by_mtime.pop()
 
     # the files left in the list are to be deleted
-    for _, _, fpath in files_by_mtime:
-        os.remove(fpath)
-
-
-def _generate_name():
+    if files_by_mtime:
+        with ThreadPoolExecutor(max_workers=min(8, len(files_by_mtime))) as executor:
+            list(executor.map(_remove_backingstore_file, [fpath for _, _, fpath in files_by_mtime]))
+
+
+# Taken from https://github.com/moby/moby/blob/master/pkg/namesgenerator/names-generator.go
+# fmt: off
+_NAME_LEFT = ("admiring", "adoring", "affectionate", "agitated", "amazing", "angry", "awesome", "beautiful",
+              "blissful", "bold", "boring", "brave", "busy", "charming", "clever", "cool", "compassionate",
+              "competent", "condescending", "confident", "cranky", "crazy", "dazzling", "determined", "distracted",
+              "dreamy", "eager", "ecstatic", "elastic", "elated", "elegant", "eloquent", "epic", "exciting",
+              "fervent", "festive", "flamboyant", "focused", "friendly", "frosty", "funny", "gallant", "gifted",
+              "goofy", "gracious", "great", "happy", "hardcore", "heuristic", "hopeful", "hungry", "infallible",
+              "inspiring", "interesting", "intelligent", "jolly", "jovial", "keen", "kind", "laughing", "loving",
+              "lucid", "magical", "mystifying", "modest", "musing", "naughty", "nervous", "nice", "nifty",
+              "nostalgic", "objective", "optimistic", "peaceful", "pedantic", "pensive", "practical", "priceless",
+              "quirky", "quizzical", "recursing", "relaxed", "reverent", "romantic", "sad", "serene", "sharp",
+              "silly", "sleepy", "stoic", "strange", "stupefied", "suspicious", "sweet", "tender", "thirsty",
+              "trusting", "unruffled", "upbeat", "vibrant", "vigilant", "vigorous", "wizardly", "wonderful",
+              "xenodochial", "youthful", "zealous", "zen")
+_NAME_RIGHT = ("albattani", "allen", "almeida", "antonelli", "agnesi", "archimedes", "ardinghelli",
+               "aryabhata", "austin", "babbage", "banach", "banzai", "bardeen", "bartik", "bassi",
+               "beaver", "bell", "benz", "bhabha", "bhaskara", "black", "blackburn", "blackwell", "bohr",
+               "booth", "borg", "bose", "bouman", "boyd", "brahmagupta", "brattain", "brown", "buck",
+               "burnell", "cannon", "carson", "cartwright", "carver", "cerf", "chandrasekhar", "chaplygin",
+               "chatelet", "chatterjee", "chebyshev", "cohen", "chaum", "clarke", "colden", "cori", "cray",
+               "curran", "curie", "darwin", "davinci", "dewdney", "dhawan", "diffie", "dijkstra", "dirac",
+               "driscoll", "dubinsky", "easley", "edison", "einstein", "elbakyan", "elgamal", "elion", "ellis",
+               "engelbart", "euclid", "euler", "faraday", "feistel", "fermat", "fermi", "feynman", "franklin",
+               "gagarin", "galileo", "galois", "ganguly", "gates", "gauss", "germain", "goldberg", "goldstine",
+               "goldwasser", "golick", "goodall", "gould", "greider", "grothendieck", "haibt", "hamilton",
+               "haslett", "hawking", "hellman", "heisenberg", "hermann", "herschel", "hertz", "heyrovsky",
+               "hodgkin", "hofstadter", "hoover", "hopper", "hugle", "hypatia", "ishizaka", "jackson", "jang",
+               "jemison", "jennings", "jepsen", "johnson", "joliot", "jones", "kalam", "kapitsa", "kare",
+               "keldysh", "keller", "kepler", "khayyam", "khorana", "kilby", "kirch", "knuth", "kowalevski",
+               "lalande", "lamarr", "lamport", "leakey", "leavitt", "lederberg", "lehmann", "lewin", "lichterman",
+               "liskov", "lovelace", "lumiere", "mahavira", "margulis", "matsumoto", "maxwell", "mayer", "mccarthy",
+               "mcclintock", "mclaren", "mclean", "mcnulty", "mendel", "mendeleev", "meitner", "meninsky", "merkle",
+               "mestorf", "mirzakhani", "moore", "morse", "murdock", "moser", "napier", "nash", "neumann", "newton",
+               "nightingale", "nobel", "noether", "northcutt", "noyce", "panini", "pare", "pascal", "pasteur",
+               "payne", "perlman", "pike", "poincare", "poitras", "proskuriakova", "ptolemy", "raman", "ramanujan",
+               "ride", "montalcini", "ritchie", "rhodes", "robinson", "roentgen", "rosalind", "rubin", "saha",
+               "sammet", "sanderson", "satoshi", "shamir", "shannon", "shaw", "shirley", "shockley", "shtern",
+               "sinoussi", "snyder", "solomon", "spence", "stonebraker", "sutherland", "swanson", "swartz",
+               "swirles", "taussig", "tereshkova", "tesla", "tharp", "thompson", "torvalds", "tu", "turing",
+               "varahamihira", "vaughan", "visvesvaraya", "volhard", "villani", "wescoff", "wilbur", "wiles",
+               "williams", "williamson", "wilson", "wing", "wozniak", "wright", "wu", "yalow", "yonath", "zhukovsky")
+# fmt: on
+
+
+def _generate_name(used_names=None):
     """
     Returns a random human-readable name
+
+    :param used_names: names of existing instances, looked up if not provided
     """
 
-    used_names = [inst["name"] for inst in instance._list_instances()]
-
-    # Taken from https://github.com/moby/moby/blob/master/pkg/namesgenerator/names-generator.go
-    # fmt: off
-    left = ["admiring", "adoring", "affectionate", "agitated", "amazing", "angry", "awesome", "beautiful",
-            "blissful", "bold", "boring", "brave", "busy", "charming", "clever", "cool", "compassionate",
-            "competent", "condescending", "confident", "cranky", "crazy", "dazzling", "determined", "distracted",
-            "dreamy", "eager", "ecstatic", "elastic", "elated", "elegant", "eloquent", "epic", "exciting",
-            "fervent", "festive", "flamboyant", "focused", "friendly", "frosty", "funny", "gallant", "gifted",
-            "goofy", "gracious", "great", "happy", "hardcore", "heuristic", "hopeful", "hungry", "infallible",
-            "inspiring", "interesting", "intelligent", "jolly", "jovial", "keen", "kind", "laughing", "loving",
-            "lucid", "magical", "mystifying", "modest", "musing", "naughty", "nervous", "nice", "nifty",
-            "nostalgic", "objective", "optimistic", "peaceful", "pedantic", "pensive", "practical", "priceless",
-            "quirky", "quizzical", "recursing", "relaxed", "reverent", "romantic", "sad", "serene", "sharp",
-            "silly", "sleepy", "stoic", "strange", "stupefied", "suspicious", "sweet", "tender", "thirsty",
-            "trusting", "unruffled", "upbeat", "vibrant", "vigilant", "vigorous", "wizardly", "wonderful",
-            "xenodochial", "youthful", "zealous", "zen"]
-    right = ["albattani", "allen", "almeida", "antonelli", "agnesi", "archimedes", "ardinghelli",
-            "aryabhata", "austin", "babbage", "banach", "banzai", "bardeen", "bartik", "bassi",
-            "beaver", "bell", "benz", "bhabha", "bhaskara", "black", "blackburn", "blackwell", "bohr",
-            "booth", "borg", "bose", "bouman", "boyd", "brahmagupta", "brattain", "brown", "buck",
-            "burnell", "cannon", "carson", "cartwright", "carver", "cerf", "chandrasekhar", "chaplygin",
-            "chatelet", "chatterjee", "chebyshev", "cohen", "chaum", "clarke", "colden", "cori", "cray",
-            "curran", "curie", "darwin", "davinci", "dewdney", "dhawan", "diffie", "dijkstra", "dirac",
-            "driscoll", "dubinsky", "easley", "edison", "einstein", "elbakyan", "elgamal", "elion", "ellis",
-            "engelbart", "euclid", "euler", "faraday", "feistel", "fermat", "fermi", "feynman", "franklin",
-            "gagarin", "galileo", "galois", "ganguly", "gates", "gauss", "germain", "goldberg", "goldstine",
-            "goldwasser", "golick", "goodall", "gould", "greider", "grothendieck", "haibt", "hamilton",
-            "haslett", "hawking", "hellman", "heisenberg", "hermann", "herschel", "hertz", "heyrovsky",
-            "hodgkin", "hofstadter", "hoover", "hopper", "hugle", "hypatia", "ishizaka", "jackson", "jang",
-            "jemison", "jennings", "jepsen", "johnson", "joliot", "jones", "kalam", "kapitsa", "kare",
-            "keldysh", "keller", "kepler", "khayyam", "khorana", "kilby", "kirch", "knuth", "kowalevski",
-            "lalande", "lamarr", "lamport", "leakey", "leavitt", "lederberg", "lehmann", "lewin", "lichterman",
-            "liskov", "lovelace", "lumiere", "mahavira", "margulis", "matsumoto", "maxwell", "mayer", "mccarthy",
-            "mcclintock", "mclaren", "mclean", "mcnulty", "mendel", "mendeleev", "meitner", "meninsky", "merkle",
-            "mestorf", "mirzakhani", "moore", "morse", "murdock", "moser", "napier", "nash", "neumann", "newton",
-            "nightingale", "nobel", "noether", "northcutt", "noyce", "panini", "pare", "pascal", "pasteur",
-            "payne", "perlman", "pike", "poincare", "poitras", "proskuriakova", "ptolemy", "raman", "ramanujan",
-            "ride", "montalcini", "ritchie", "rhodes", "robinson", "roentgen", "rosalind", "rubin", "saha",
-            "sammet", "sanderson", "satoshi", "shamir", "shannon", "shaw", "shirley", "shockley", "shtern",
-            "sinoussi", "snyder", "solomon", "spence", "stonebraker", "sutherland", "swanson", "swartz",
-            "swirles", "taussig", "tereshkova", "tesla", "tharp", "thompson", "torvalds", "tu", "turing",
-            "varahamihira", "vaughan", "visvesvaraya", "volhard", "villani", "wescoff", "wilbur", "wiles",
-            "williams", "williamson", "wilson", "wing", "wozniak", "wright", "wu", "yalow", "yonath", "zhukovsky"]
-    # fmt: on
-
-    name = "%s_%s" % (random.choice(left), random.choice(right))
+    if used_names is None:
+        from testcloud import instance
+
+        used_names = {inst["name"] for inst in instance._list_instances()}
+
+    name = "%s_%s" % (random.choice(_NAME_LEFT), random.choice(_NAME_RIGHT))
 
     while name in used_names:
-        name = "%s_%s" % (random.choice(left), random.choice(right))
+        name = "%s_%s" % (random.choice(_NAME_LEFT), random.choice(_NAME_RIGHT))
 
     return name
 
 
+def _is_image_url(url):
+    """
+    Tells apart image urls (the schemes supported by :py:class:`image.Image`) from distro:version handles
+    """
+    return urlparse(url).scheme in ("http", "https", "file")
+
+
+def _resolve_url(args):
+    """
+    Returns the image url for args.url, resolving distro:version handles for args.arch
+    """
+    if _is_image_url(args.url):
+        return args.url
+
+    from testcloud.util import get_image_url
+
+    return get_image_url(args.url, arch=args.arch)
+
+
 def _download_image(args):
+    from testcloud import image
+
     if not args.url:
         log.error("Url wasn't specified.")
         sys.exit(1)
 
+    # Resolved here rather than in the parser, as the parser is built only once
+    if not args.dest_path:
+        args.dest_path = os.getcwd()
+
     try:
-        # FIXME maybe change to smth like   ... if args.url[:4] not in ["http", "file"]
-        url = get_image_url(args.url, arch=args.arch) if not any([prot in args.url for prot in ["http", "file"]]) else args.url
+        url = _resolve_url(args)
     except TestcloudImageError:
-        log.error("Couldn't find the desired image ( %s )..." % args.url)
+        log.error("Couldn't find the desired image ( %s )...", args.url)
         sys.exit(1)
 
     try:
@@ -289,7 +376,7 @@ def _download_image(args):
         log.error("Couldn't download the requested image due to an error.")
         sys.exit(1)
     except TestcloudPermissionsError:
-        log.error("Couldn't write to the requested target location ( %s )." % args.dest_path)
+        log.error("Couldn't write to the requested target location ( %s ).", args.dest_path)
 
 
 def _create_instance(args):
@@ -298,15 +385,24 @@ def _create_instance(args):
 
     :param args: args from argparser
     """
+    # The only handler that needs libvirt directly
+    import libvirt
+
+    from testcloud import image, instance
+    from testcloud.domain_configuration import _get_default_domain_conf
 
+    # The instances are needed only for the backingstore cleanup, list them once and reuse them for naming too
+    instances = None
     try:
-        _clean_backingstore(args)
+        if int(config_data.BACKINGSTORE_SIZE):
+            instances = instance.list_instances()
+        _clean_backingstore(args, instances)
     except (ValueError, PermissionError):
         # Cleanup errors aren't critical
         pass
 
     if not args.name:
-        args.name = _generate_name()
+        args.name = _generate_name(None if instances is None else {inst["name"] for inst in instances})
 
     if not args.url:
         log.error("Missing url or distribution:version specification.")
@@ -326,13 +422,13 @@ def _create_instance(args):
         sys.exit(1)
 
     try:
-        url = get_image_url(args.url, arch=args.arch) if not any([prot in args.url for prot in ["http", "file"]]) else args.url
+        url = _resolve_url(args)
         assert url
     except (TestcloudImageError, AssertionError):
-        log.error("Couldn't find the desired image ( %s )..." % args.url)
+        log.error("Couldn't find the desired image ( %s )...", args.url)
         sys.exit(1)
 
-    coreos = bool(re.search("coreos|rhcos", url.lower()))
+    coreos = bool(_COREOS_RE.search(url.lower()))
 
     virtiofs_split = args.virtiofs.split(":") if args.virtiofs else [None, None]
     if args.virtiofs:
@@ -356,7 +452,7 @@ def _create_instance(args):
         # User might not be part of testcloud group, print user friendly message how to fix this
         _handle_permissions_error_cli(error)
     except TestcloudImageError:
-        log.error("Couldn't download the desired image (%s)..." % url)
+        log.error("Couldn't download the desired image (%s)...", url)
         sys.exit(1)
 
     # By default, unspecified arg value is -1, so we fall back to config_data, for normal cloud or coreos
@@ -393,7 +489,7 @@ def _create_instance(args):
         desired_arch=args.arch,
         workarounds=Workarounds(defaults=True),
     )
-    log.info("create %s instance %s" % ("coreos" if coreos else "cloud", args.name))
+    log.info("create %s instance %s", "coreos" if coreos else "cloud", args.name)
 
     if coreos:
         tc_instance.ssh_path = args.ssh_path
@@ -450,38 +546,42 @@ def _create_instance(args):
     # Write ip to file
     tc_instance.create_ip_file(vm_ip)
 
-    # CentOS .box files don't have cloud-init at all
-    centos_vagrant = bool(re.search(r"centos-(.*)-vagrant-(.*)", args.url.lower()))
-    # Fedora .box files have cloud-init masked
-    fedora_vagrant = bool(re.search(r"fedora-cloud-base-vagrant-(.*)", args.url.lower()))
+    url_lower = args.url.lower()
+    centos_vagrant = bool(_CENTOS_VAGRANT_RE.search(url_lower))
+    fedora_vagrant = bool(_FEDORA_VAGRANT_RE.search(url_lower))
     if centos_vagrant:
         tc_instance.prepare_vagrant_init(config_data.VARGANT_CENTOS_SH)
     if fedora_vagrant:
         tc_instance.prepare_vagrant_init(config_data.VAGRANT_FEDORA_SH)
 
     # List connection details
-    print("The IP of vm {}:  {}".format(args.name, vm_ip))
-    print("The SSH port of vm {}:  {}".format(args.name, vm_port))
+    print(f"The IP of vm {args.name}:  {vm_ip}")
+    print(f"The SSH port of vm {args.name}:  {vm_port}")
 
     _handle_connection_tip(vm_ip, vm_port, centos_vagrant or fedora_vagrant)
 
 
 def _domain_tip(args, action):
     connection = args.connection
-    domains = {
-        "qemu:///system": instance._prepare_domain_list(connection="qemu:///system"),
-        "qemu:///session": instance._prepare_domain_list(connection="qemu:///session"),
-    }
+    other_connections = {"qemu:///system": "qemu:///session", "qemu:///session": "qemu:///system"}
     # We do the following check only for standard domains, not to break any (probaly not working anyway) wild deployments
-    if args.name not in domains[connection].keys() and connection in domains.keys():
-        del domains[connection]
-        other_connection = list(domains.keys())[0]
-        if args.name in domains[other_connection]:
+    if connection not in other_connections:
+        return
+
+    from testcloud import instance
+
+    # Look into the other domain only if the instance isn't in the requested one
+    if args.name not in instance._prepare_domain_list(connection=connection):
+        other_connection = other_connections[connection]
+        if args.name in instance._prepare_domain_list(connection=other_connection):
             log.error(
-                "You have tried to %s a %s instance from a %s domain, "
-                "but it exists in %s domain." % (action, args.name, connection, other_connection)
+                "You have tried to %s a %s instance from a %s domain, but it exists in %s domain.",
+                action,
+                args.name,
+                connection,
+                other_connection,
             )
-            log.error("You can specify '-c %s' to %s this instance." % (other_connection, action))
+            log.error("You can specify '-c %s' to %s this instance.", other_connection, action)
 
             if action == "remove":
                 if not "force" in args or args.force == False:
@@ -501,6 +601,8 @@ def _start_instance(args):
     log.info("start instance: {}".format(args.name))
     _domain_tip(args, "start")
 
+    from testcloud import instance
+
     tc_instance = instance.find_instance(args.name, connection=args.connection)
 
     if tc_instance is None:
@@ -510,8 +612,8 @@ def _start_instance(args):
     tc_instance.start(args.timeout)
     vm_ip = tc_instance.get_ip()
     vm_port = tc_instance.get_instance_port()
-    print("The IP of vm {}:  {}".format(args.name, vm_ip))
-    print("The SSH port of vm {}:  {}".format(args.name, vm_port))
+    print(f"The IP of vm {args.name}:  {vm_ip}")
+    print(f"The SSH port of vm {args.name}:  {vm_port}")
     _handle_connection_tip(vm_ip, vm_port)
 
 
@@ -524,6 +626,8 @@ def _stop_instance(args):
     log.info("stop instance: {}".format(args.name))
     _domain_tip(args, "stop")
 
+    from testcloud import instance
+
     tc_instance = instance.find_instance(args.name, connection=args.connection)
 
     if tc_instance is None:
@@ -543,6 +647,8 @@ def _shutdown_instance(args, raise_e=False):
     log.info("shutdown instance: {}".format(args.name))
     _domain_tip(args, "shutdown")
 
+    from testcloud import instance
+
     tc_instance = instance.find_instance(args.name, connection=args.connection)
 
     if tc_instance is None:
@@ -566,6 +672,8 @@ def _remove_instance(args):
     log.info("remove instance: {}".format(args.name))
     _domain_tip(args, "remove")
 
+    from testcloud import instance
+
     tc_instance = instance.find_instance(args.name, connection=args.connection)
 
     if tc_instance is None:
@@ -585,6 +693,7 @@ def _clean_instances(args):
 
     :param args: args from argparser
     """
+    from testcloud import instance
 
     instance.clean_instances()
 
@@ -621,6 +730,8 @@ def _list_image(args):
 
     :param args: args from argparser
     """
+    from testcloud import image
+
     log.info("list images")
     images = image.list_images()
     print("Current Images:")
@@ -635,6 +746,8 @@ def _remove_image(args):
     :param args: args from argparser
     """
 
+    from testcloud import image
+
     log.info("removing image {}".format(args.name))
 
     tc_image = image.find_image(args.name)
@@ -646,254 +759,204 @@ def _remove_image(args):
     tc_image.remove()
 
 
-def get_argparser():
-    parser = argparse.ArgumentParser(description=description)
-    subparsers = parser.add_subparsers(
-        title="Command Types",
-        description="Types of commands available",
-        help="<command> --help",
-    )
-
+def _add_name_argument(parser, action, kind="instance"):
     parser.add_argument(
-        "-c",
-        "--connection",
-        default="qemu:///system",
-        help="libvirt connection url to use",
+        "name",
+        help="name of {} to {}".format(kind, action),
     )
 
-    # instance list
-    instarg_list = subparsers.add_parser("list", help="list all instances")
-    instarg_list.set_defaults(func=_list_instance)
 
-    # instance start
-    instarg_start = subparsers.add_parser("start", help="start instance")
-    instarg_start.add_argument(
-        "name",
-        help="name of instance to start",
-    )
-    instarg_start.add_argument(
+def _add_timeout_argument(parser):
+    parser.add_argument(
         "--timeout",
-        help="Time (in seconds) to wait for boot to " "complete before completion, setting to 0" " disables all waiting.",
+        help=_HELP_TIMEOUT,
         type=int,
-        default=config_data.BOOT_TIMEOUT,
+        default=_BOOT_TIMEOUT,
     )
-    instarg_start.set_defaults(func=_start_instance)
 
-    # instance stop
-    instarg_stop = subparsers.add_parser("stop", help="stop instance (forced poweroff, same as 'instance force-off')")
-    instarg_stop.add_argument(
-        "name",
-        help="name of instance to stop",
-    )
-    instarg_stop.set_defaults(func=_stop_instance)
-    # instance force-off
-    instarg_foff = subparsers.add_parser("force-off", help="force-off instance (forced poweroff, same as 'instance stop')")
-    instarg_foff.add_argument(
-        "name",
-        help="name of instance to force-off",
-    )
-    instarg_foff.set_defaults(func=_stop_instance)
-    # instance shutdown
-    instarg_shutdown = subparsers.add_parser("shutdown", help="shutdown instance (graceful poweroff)")
-    instarg_shutdown.add_argument(
-        "name",
-        help="name of instance to shutdown",
-    )
-    instarg_shutdown.set_defaults(func=_shutdown_instance)
-    # instance remove
-    instarg_remove = subparsers.add_parser("remove", help="remove instance")
-    instarg_remove.add_argument(
-        "name",
-        help="name of instance to remove",
-    )
-    instarg_remove.add_argument(
-        "-f",
-        "--force",
-        help="Stop the instance if it's running",
-        action="store_true",
-    )
-    instarg_remove.set_defaults(func=_remove_instance)
 
-    instarg_destroy = subparsers.add_parser("destroy", help="deprecated alias for remove")
-    instarg_destroy.add_argument(
-        "name",
-        help="name of instance to remove",
-    )
-    instarg_destroy.add_argument(
+def _populate_list(parser):
+    parser.set_defaults(func=_list_instance)
+
+
+def _populate_start(parser):
+    _add_name_argument(parser, "start")
+    _add_timeout_argument(parser)
+    parser.set_defaults(func=_start_instance)
+
+
+def _populate_stop(parser):
+    _add_name_argument(parser, "stop")
+    parser.set_defaults(func=_stop_instance)
+
+
+def _populate_force_off(parser):
+    _add_name_argument(parser, "force-off")
+    parser.set_defaults(func=_stop_instance)
+
+
+def _populate_shutdown(parser):
+    _add_name_argument(parser, "shutdown")
+    parser.set_defaults(func=_shutdown_instance)
+
+
+def _populate_remove(parser):
+    _add_name_argument(parser, "remove")
+    parser.add_argument(
         "-f",
         "--force",
         help="Stop the instance if it's running",
         action="store_true",
     )
-    instarg_destroy.set_defaults(func=_remove_instance)
+    parser.set_defaults(func=_remove_instance)
 
-    # instance clean
-    instarg_clean = subparsers.add_parser("clean", help="remove non-existing libvirt vms from testcloud")
-    instarg_clean.set_defaults(func=_clean_instances)
 
-    # instance reboot
-    instarg_reboot = subparsers.add_parser("reboot", help="reboot instance (graceful reboot)")
-    instarg_reboot.add_argument(
-        "name",
-        help="name of instance to reboot",
-    )
-    instarg_reboot.add_argument(
-        "--timeout",
-        help="Time (in seconds) to wait for boot to " "complete before completion, setting to 0" " disables all waiting.",
-        type=int,
-        default=config_data.BOOT_TIMEOUT,
-    )
-    instarg_reboot.set_defaults(func=_reboot_instance)
-    # instance reset
-    instarg_reset = subparsers.add_parser("reset", help="reset instance (forced reboot)")
-    instarg_reset.add_argument(
-        "name",
-        help="name of instance to reset",
-    )
-    instarg_reset.add_argument(
-        "--timeout",
-        help="Time (in seconds) to wait for boot to " "complete before completion, setting to 0" " disables all waiting.",
-        type=int,
-        default=config_data.BOOT_TIMEOUT,
-    )
-    instarg_reset.set_defaults(func=_reset_instance)
-    # instance create
-    create_help = """
-    URL to qcow2 image or distro:release string is required.
-    Examples of some known distro:release pairs:
-    - fedora:rawhide (latest compose), fedora:33, fedora:latest (latest Fedora GA image)
-    - fedora:qa-matrix (image from https://fedoraproject.org/wiki/Test_Results:Current_Cloud_Test )
-    - centos:XX (eg. centos:8, centos:latest)
-    - centos-stream:XX (eg. centos-stream:8, centos-stream:latest)
-    - ubuntu:release_name (eg. ubuntu:focal, ubuntu:latest)
-    - debian:release_name/release_number (eg. debian:11, debian:sid, debian:latest)
-    """
-    instarg_create = subparsers.add_parser("create", help="create instance", formatter_class=argparse.RawTextHelpFormatter)
-    instarg_create.set_defaults(func=_create_instance)
-    instarg_create.add_argument(
+def _populate_clean(parser):
+    parser.set_defaults(func=_clean_instances)
+
+
+def _populate_reboot(parser):
+    _add_name_argument(parser, "reboot")
+    _add_timeout_argument(parser)
+    parser.set_defaults(func=_reboot_instance)
+
+
+def _populate_reset(parser):
+    _add_name_argument(parser, "reset")
+    _add_timeout_argument(parser)
+    parser.set_defaults(func=_reset_instance)
+
+
+def _populate_create(parser):
+    parser.formatter_class = argparse.RawTextHelpFormatter
+    parser.set_defaults(func=_create_instance)
+    parser.add_argument(
         "url",
-        help=create_help,
+        help=_HELP_URL,
         type=str,
         nargs="?",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "-n",
         "--name",
         help="name of instance to create",
         type=str,
         default=None,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "-a",
         "--arch",
         help="desired architecture of an instance",
         type=str,
-        default=platform.machine(),
+        default=_ARCH,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--ram",
         help="Specify the amount of ram in MiB for the VM.",
         type=int,
         # Default value is handled in _create_instance (config_data.RAM or config_data.RAM_COREOS)
         default=-1,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--vcpus",
         help="Number of virtual CPU cores to assign to the VM.",
-        default=config_data.VCPUS,
+        type=int,
+        default=_VCPUS,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--no-graphic",
         help="Turn off graphical display.",
         action="store_true",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--vnc",
         help="Turns on vnc at :1 to the instance.",
         action="store_true",
     )
-    instarg_create.add_argument(
-        "--timeout",
-        help="Time (in seconds) to wait for boot to " "complete before completion, setting to 0" " disables all waiting.",
-        type=int,
-        default=config_data.BOOT_TIMEOUT,
-    )
-    instarg_create.add_argument(
+    _add_timeout_argument(parser)
+    parser.add_argument(
         "--disksize",
         help="Desired instance disk size, in GB",
         type=int,
         # Same as with RAM few line above
         default=-1,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--keep",
         help="Don't remove instance from disk when something fails, useful for debugging",
         action="store_true",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--dry",
         help="Don't spawn an actual instance, useful for debugging",
         action="store_true",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--ssh_path",
         help="specify your ssh pubkey path",
         type=str,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--bu_file",
         help="specify your bu file path",
         type=str,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--ign_file",
         help="specify your ign file path",
         type=str,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--qemu_cmds",
         type=str,
         help="specify qemu commands",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--mac_address",
         type=str,
         help="specify mac address",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--tpm",
         help="add tpm device",
         action="store_true",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--serial",
         help="set Serial number",
         action="store_true",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--disk_number",
         help="Desired disk number",
         type=int,
         default=1,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--nic_number",
         help="Desired nic number",
         type=int,
         default=1,
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--virtiofs",
         type=str,
         help="specify a local directory to mount and mount target like <host path>:<guest path>",
     )
-    instarg_create.add_argument(
+    parser.add_argument(
         "--iommu",
         help="add iommu device",
         action="store_true",
     )
-    imgarg = subparsers.add_parser("image", help="help on image options")
-    imgarg_subp = imgarg.add_subparsers(
+
+
+def _populate_image_remove(parser):
+    _add_name_argument(parser, "remove", kind="image")
+    parser.set_defaults(func=_remove_image)
+
+
+def _populate_image(parser):
+    imgarg_subp = parser.add_subparsers(
         title="subcommands",
         description="Types of commands available",
         help="<command> help",
@@ -904,66 +967,175 @@ def get_argparser():
     imgarg_list.set_defaults(func=_list_image)
 
     # image remove
-    imgarg_remove = imgarg_subp.add_parser("remove", help="remove image")
-    imgarg_remove.add_argument(
-        "name",
-        help="name of image to remove",
-    )
-    imgarg_remove.set_defaults(func=_remove_image)
-
-    imgarg_destroy = imgarg_subp.add_parser("destroy", help="deprecated alias for remove")
-    imgarg_destroy.add_argument(
-        "name",
-        help="name of image to remove",
-    )
-    imgarg_destroy.set_defaults(func=_remove_image)
+    _populate_image_remove(imgarg_subp.add_parser("remove", help="remove image"))
+    _populate_image_remove(imgarg_subp.add_parser("destroy", help="deprecated alias for remove"))
 
     # image download
     imarg_download = imgarg_subp.add_parser("download", help="download image")
     imarg_download.add_argument(
         "url",
-        help=create_help,
+        help=_HELP_URL,
         type=str,
     )
     imarg_download.add_argument(
         "-d",
         "--dest_path",
-        help="dest path to put image",
+        help="dest path to put image (defaults to the current working directory)",
         type=str,
-        default=os.getcwd(),
+        default=None,
     )
     imarg_download.add_argument(
         "-a",
         "--arch",
         help="desired architecture of an image",
         type=str,
-        default=platform.machine(),
+        default=_ARCH,
     )
 
     imarg_download.set_defaults(func=_download_image)
 
+
+# command name -> (help, function populating the command's own arguments)
+_COMMANDS = {
+    "list": ("list all instances", _populate_list),
+    "start": ("start instance", _populate_start),
+    "stop": ("stop instance (forced poweroff, same as 'instance force-off')", _populate_stop),
+    "force-off": ("force-off instance (forced poweroff, same as 'instance stop')", _populate_force_off),
+    "shutdown": ("shutdown instance (graceful poweroff)", _populate_shutdown),
+    "remove": ("remove instance", _populate_remove),
+    "destroy": ("deprecated alias for remove", _populate_remove),
+    "clean": ("remove non-existing libvirt vms from testcloud", _populate_clean),
+    "reboot": ("reboot instance (graceful reboot)", _populate_reboot),
+    "reset": ("reset instance (forced reboot)", _populate_reset),
+    "create": ("create instance", _populate_create),
+    "image": ("help on image options", _populate_image),
+}
+
+
+class _LazySubParsersAction(argparse._SubParsersAction):
+    """Subparsers action which adds the commands' own arguments only once the command gets selected.
+    The commands are registered right away, so that they show up in help and are accepted as valid choices.
+    """
+
+    class _ParserMap(dict):
+        def __init__(self):
+            super().__init__()
+            self.populators = {}
+
+        def __getitem__(self, name):
+            parser = super().__getitem__(name)
+            populate = self.populators.pop(name, None)
+            if populate is not None:
+                populate(parser)
+            return parser
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._name_parser_map = self.choices = self._ParserMap()
+
+    def add_parser(self, name, populate=None, **kwargs):
+        """Registers the command, ``populate(parser)`` is called when the command is looked up for the first time."""
+        parser = super().add_parser(name, **kwargs)
+        if populate is not None:
+            self._name_parser_map.populators[name] = populate
+        return parser
+
+    def populate_all(self):
+        for name in list(self._name_parser_map.populators):
+            self._name_parser_map[name]
+
+
+def get_argparser():
+    """Returns the argument parser with all the commands fully populated."""
+    parser = _build_argparser()
+    for action in parser._actions:
+        if isinstance(action, _LazySubParsersAction):
+            action.populate_all()
+    return parser
+
+
+@functools.lru_cache(maxsize=None)
+def _build_argparser():
+    """Builds the argument parser. The commands get their own arguments only when they are run,
+    building the arguments of all the other commands is wasted work.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    subparsers = parser.add_subparsers(
+        action=_LazySubParsersAction,
+        title="Command Types",
+        description="Types of commands available",
+        help="<command> --help",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--connection",
+        default="qemu:///system",
+        help="libvirt connection url to use",
+    )
+
+    for command, (command_help, populate) in _COMMANDS.items():
+        subparsers.add_parser(command, populate=populate, help=command_help)
+
     return parser
 
 
+_logging_configured = False
+
+
 def _configure_logging(level=logging.DEBUG):
     """Set up logging framework, when running in main script mode. Should not
-    be called when running in library mode.
+    be called when running in library mode. Only the first call has any effect.
 
     :param int level: the stream log level to be set (one of the constants from logging.*)
     """
-    logging.basicConfig(format="%(levelname)s:%(message)s", level=level)
+    global _logging_configured
+    if _logging_configured:
+        return
+
+    # Only log to a file when specifically configured to
+    if config_data.LOG_FILE is not None:
+        logging.basicConfig(filename=config_data.LOG_FILE, level=logging.DEBUG)
+    # The level has to be set on the handler too, loggers with their own level (like ours) bypass the root level
+    handler = logging.StreamHandler()
+    handler.setLevel(level)
+    logging.basicConfig(format="%(levelname)s:%(message)s", level=level, handlers=[handler])
+    _logging_configured = True
+
+
+def _env_log_level():
+    """Returns the level name from TESTCLOUD_LOG_LEVEL, None if it isn't set or isn't a known level name."""
+    level = os.environ.get("TESTCLOUD_LOG_LEVEL", "").upper()
+    # getLevelName() maps the known level names to their numbers
+    return level if isinstance(logging.getLevelName(level), int) else None
+
+
+def _stream_log_level():
+    """Picks the stream log level for main script mode: TESTCLOUD_LOG_LEVEL if set,
+    DEBUG when running in a terminal and WARNING when the output is piped or scripted.
+    """
+    return _env_log_level() or (logging.DEBUG if sys.stderr.isatty() else logging.WARNING)
 
 
 def main():
-    parser = get_argparser()
+    parser = _build_argparser()
+    if len(sys.argv) == 1:
+        # Nothing to run, print the list of commands without any further setup
+        parser.print_help()
+        sys.exit(1)
+
     args = parser.parse_args()
 
-    _configure_logging()
+    _configure_logging(_stream_log_level())
+    # Reported only now, before the logging is configured the warning would have nowhere to go
+    if os.environ.get("TESTCLOUD_LOG_LEVEL") and not _env_log_level():
+        log.warning("Unknown TESTCLOUD_LOG_LEVEL %r, using the default log level instead.", os.environ["TESTCLOUD_LOG_LEVEL"])
 
-    if hasattr(args, "func"):
-        args.func(args)
-    else:
+    handler = getattr(args, "func", None)
+    if handler is None:
         # If no cmdline args were provided, func is missing
         # https://bugs.python.org/issue16308
         parser.print_help()
         sys.exit(1)
+
+    handler(args)
@@ -10,14 +10,23 @@ import testcloud
 
 DEFAULT_CONF_DIR = os.path.abspath(os.path.dirname(testcloud.__file__)) + "/../conf"
 
-CONF_DIRS = [
+CONF_DIRS = (
     DEFAULT_CONF_DIR,
-    "{}/.config/testcloud".format(os.environ["HOME"]),
+    # Falls back to the passwd entry when HOME isn't set (e.g. in some containers)
+    os.path.expanduser("~/.config/testcloud"),
     "/etc/testcloud",
-]
+)
 
 CONF_FILE = "settings.py"
 
+# Beginning of the default USER_DATA, used to tell apart customized USER_DATA
+DEFAULT_USER_DATA_HEADER = """#cloud-config
+ssh_pwauth: true
+password: ${password}
+chpasswd:
+  expire: false
+"""
+
 _config = None
 
 
@@ -122,12 +131,7 @@ class ConfigData(object):
     META_DATA = """instance-id: iid-123456
 local-hostname: %s
 """
-    USER_DATA = """#cloud-config
-ssh_pwauth: true
-password: ${password}
-chpasswd:
-  expire: false
-users:
+    USER_DATA = DEFAULT_USER_DATA_HEADER + """users:
   - default
   - name: cloud-user
     plain_text_passwd: ${password}
@@ -280,21 +284,23 @@ storage:
         """Overwrites default values with values from a python object which have
         names containing all upper case letters.
 
-        :param obj: python object containing configuration values
+        :param obj: python object containing configuration values in its own namespace
+            (such as the module returned by :func:`_load_config`)
         :type obj: python object
         """
 
-        for key in dir(obj):
+        # The values are in the object's own namespace, no need to walk (and sort) everything dir() would find
+        for key, value in vars(obj).items():
             if key.isupper():
                 if key != "DATA_DIR":
-                    setattr(self, key, getattr(obj, key))
+                    setattr(self, key, value)
                 else:
                     # I hate life... but since we want to "automagically" work around TMT's
                     #  way of changing the DATA_DIR on the fly, I don't see another way.
                     try:
-                        self.DATA_DIR = getattr(obj, key)
+                        self.DATA_DIR = value
                     except AttributeError as e:
                         if 'partially initialized module' in str(e):
-                            self.__DATA_DIR = getattr(obj, key)
+                            self.__DATA_DIR = value
                         else:
                             raise
@@ -7,19 +7,20 @@ import logging
 
 from testcloud import config
 from testcloud import exceptions
-from testcloud.distro_utils.misc import parse_latest_qcow
+from testcloud.distro_utils.misc import RESOLVED_URL_TTL, parse_latest_qcow, ttl_cache
 
 log = logging.getLogger("testcloud.util")
 config_data = config.get_config()
 
 
+@ttl_cache(RESOLVED_URL_TTL)
 def get_alma_image_url(version: str, arch: str) -> str:
     if version == "latest":
         version = config_data.ALMA_VERSIONS["latest"]
 
     # TODO Parse closest mirrors (there is no base mirror for alma)
     STREAM_URL_PREFIX = config_data.ALMA_URL_PREFIX.format(version, arch)
-    IMG_NAME = r"AlmaLinux-{0}-GenericCloud-{0}.[0-9.]-[0-9.]+.{1}.qcow2".format(version, arch)
+    IMG_NAME = r"AlmaLinux-{0}-GenericCloud-{0}\.[0-9.]-[0-9.]+\.{1}\.qcow2".format(version, arch)
     try:
         return parse_latest_qcow(IMG_NAME, STREAM_URL_PREFIX)
     except:
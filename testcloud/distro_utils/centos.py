@@ -7,7 +7,7 @@ import logging
 
 from testcloud import config
 from testcloud import exceptions
-from testcloud.distro_utils.misc import parse_latest_qcow
+from testcloud.distro_utils.misc import RESOLVED_URL_TTL, parse_latest_qcow, ttl_cache
 
 log = logging.getLogger("testcloud.util")
 config_data = config.get_config()
@@ -21,6 +21,7 @@ def get_centos_stream_image_url(version: str, arch: str) -> str:
     return _get_centos_image_url(version=version, stream=True, arch=arch)
 
 
+@ttl_cache(RESOLVED_URL_TTL)
 def _get_centos_image_url(version: str, stream: bool, arch: str) -> str:
     if stream:
         # CentOS Stream
@@ -35,7 +36,7 @@ def _get_centos_image_url(version: str, stream: bool, arch: str) -> str:
         # Try to dynamically get the latest at first
         else:
             STREAM_URL_PREFIX = config_data.CENTOS_STREAM_URL_PREFIX.format(version, arch)
-        IMG_NAME = r"CentOS-Stream-GenericCloud-{0}-[0-9.]+.{1}.qcow2".format(version, arch)
+        IMG_NAME = r"CentOS-Stream-GenericCloud-{0}-[0-9.]+\.{1}\.qcow2".format(version, arch)
         try:
             return parse_latest_qcow(IMG_NAME, STREAM_URL_PREFIX)
         except:
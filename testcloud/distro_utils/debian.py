@@ -12,30 +12,36 @@ log = logging.getLogger("testcloud.util")
 config_data = config.get_config()
 
 
-def get_debian_image_url(version: str, arch: str) -> str:
-    arch_map = {"x86_64": "amd64", "aarch64": "arm64", "ppc64le": "ppc64el"}
+_ARCH_MAP = {"x86_64": "amd64", "aarch64": "arm64", "ppc64le": "ppc64el"}
+
 
-    if arch not in arch_map:
+def get_debian_image_url(version: str, arch: str) -> str:
+    debian_arch = _ARCH_MAP.get(arch)
+    if not debian_arch:
         log.error("Requested architecture is not supported by testcloud for Debian.")
         raise exceptions.TestcloudImageError
 
+    # Only the x86_64 images come in the genericcloud flavor, don't touch the configured url itself though
+    img_url = config_data.DEBIAN_IMG_URL
     if arch != "x86_64":
-        config_data.DEBIAN_IMG_URL = config_data.DEBIAN_IMG_URL.replace("genericcloud", "generic")
-
-    inverted_releases = {v: k for k, v in config_data.DEBIAN_RELEASE_MAP.items()}
+        img_url = img_url.replace("genericcloud", "generic")
 
     if version == "latest":
-        return config_data.DEBIAN_IMG_URL % (
+        return img_url % (
             config_data.DEBIAN_RELEASE_MAP[config_data.DEBIAN_LATEST],
             config_data.DEBIAN_LATEST,
-            arch_map[arch],
+            debian_arch,
         )
     elif version == "sid":
-        return config_data.DEBIAN_IMG_URL % (version, version, arch_map[arch])
+        return img_url % (version, version, debian_arch)
     elif version in config_data.DEBIAN_RELEASE_MAP:
-        return config_data.DEBIAN_IMG_URL % (config_data.DEBIAN_RELEASE_MAP[version], version, arch_map[arch])
-    elif version in config_data.DEBIAN_RELEASE_MAP.values():
-        return config_data.DEBIAN_IMG_URL % (version, inverted_releases[version], arch_map[arch])
+        return img_url % (config_data.DEBIAN_RELEASE_MAP[version], version, debian_arch)
+
+    # The release map can be overridden in settings.py, so it's inverted here rather than at import
+    inverted_releases = {v: k for k, v in config_data.DEBIAN_RELEASE_MAP.items()}
+
+    if version in inverted_releases:
+        return img_url % (version, inverted_releases[version], debian_arch)
     else:
         log.error(
             "Unknown Debian release, valid releases are: "
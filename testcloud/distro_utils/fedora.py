@@ -9,11 +9,17 @@ import requests
 
 from testcloud import config
 from testcloud import exceptions
-from testcloud.distro_utils.misc import get_requests_session
+from testcloud.distro_utils.misc import RESOLVED_URL_TTL, get_requests_session, parse_json, ttl_cache
 
 log = logging.getLogger("testcloud.util")
 config_data = config.get_config()
 
+# Timeout, in seconds, for fetching the release lists
+_RELEASES_TIMEOUT = 30
+
+# Links to the nominated compose images on the wiki, qa-matrix is available only for x86_64
+_QA_MATRIX_QCOW_RE = re.compile(r'href="([^"]+x86_64\.qcow2)"')
+
 
 def _process_coreos_url(version: str, arch: str, platform: str) -> str:
     """
@@ -30,13 +36,14 @@ def _process_coreos_url(version: str, arch: str, platform: str) -> str:
         log.error("Invalid platform ( %s ) requested for Fedora CoreOS." % platform)
         raise exceptions.TestcloudImageError
     try:
-        result = session.get("https://builds.coreos.fedoraproject.org/streams/%s.json" % version).json()
+        result = parse_json(session.get("https://builds.coreos.fedoraproject.org/streams/%s.json" % version))
     except (ConnectionError, IndexError, requests.exceptions.JSONDecodeError):
         log.error("Failed to fetch the image.")
         raise exceptions.TestcloudImageError
     return str(result["architectures"][arch]["artifacts"][platform]["formats"]["qcow2.xz"]["disk"]["location"])
 
 
+@ttl_cache(RESOLVED_URL_TTL)
 def get_coreos_image_url(version: str, arch: str) -> str:
     """
     Returns an image for Fedora CoreOS
@@ -45,6 +52,7 @@ def get_coreos_image_url(version: str, arch: str) -> str:
     return _process_coreos_url(version, arch, "qemu")
 
 
+@ttl_cache(RESOLVED_URL_TTL)
 def get_fedora_openstack_image_url(version: str, arch: str) -> str:
     """
     Returns an image for Fedora CoreOS for OpenStack
@@ -53,97 +61,140 @@ def get_fedora_openstack_image_url(version: str, arch: str) -> str:
     return _process_coreos_url(version, arch, "openstack")
 
 
-def get_fedora_image_url(version: str, arch: str) -> str:
+def _get_fedora_nightlies() -> list:
     """
-    Accepts string specifying desired fedora version, pssible values are:
-        - latest (translates to the latest Fedora GA) or XX (where XX is fedora release number)
-        - rawhide/branched (the latest successful nightly compose)
-        - qa-matrix (nominated compose for testing, can result it either some rawhide nigthly or branched nightly)
-    Returns url to Fedora Cloud qcow2
+    Returns the list of the latest nightly compose images from openQA
+    """
+    return parse_json(get_requests_session().get("https://openqa.fedoraproject.org/nightlies.json", timeout=_RELEASES_TIMEOUT))
+
+
+@ttl_cache(RESOLVED_URL_TTL)
+def _get_fedora_release_links() -> dict:
+    """
+    Returns lists of Fedora Cloud Base qcow2 links from releases.json indexed by (version, arch), in the order listed,
+    indexed once per RESOLVED_URL_TTL so that repeated lookups don't scan the whole list again
+    """
+    releases = parse_json(get_requests_session().get("https://getfedora.org/releases.json", timeout=_RELEASES_TIMEOUT))
+
+    links = {}
+    for release in releases:
+        if release["subvariant"] == "Cloud_Base" and release["link"].endswith(".qcow2"):
+            links.setdefault((release["version"], release["arch"]), []).append(release["link"])
+    return links
+
+
+def _get_qa_matrix_image_url(arch: str) -> str:
+    """
+    Returns url to the Fedora Cloud qcow2 of the compose currently nominated for testing
+    """
+    if arch != "x86_64":
+        log.error("non-x86_64 architecture is not supported with Fedora qa-matrix.")
+        raise exceptions.TestcloudImageError
+    try:
+        # Never cache this one
+        with requests.get("https://fedoraproject.org/wiki/Test_Results:Current_Installation_Test", stream=True) as nominated_response:
+            nominated_response.encoding = nominated_response.encoding or "utf-8"
+            # We only need the first link, don't download and scan the whole page
+            for line in nominated_response.iter_lines(decode_unicode=True):
+                match = _QA_MATRIX_QCOW_RE.search(line)
+                if match:
+                    return str(match.group(1))
+    except ConnectionError:
+        pass
+    log.error("Couldn't fetch the current Fedora image from qa-matrix ..")
+    raise exceptions.TestcloudImageError
+
+
+@ttl_cache(RESOLVED_URL_TTL)
+def _get_fedora_image_url(version: str, arch: str) -> str:
+    """
+    Returns url to Fedora Cloud qcow2 for any of the versions get_fedora_image_url accepts but qa-matrix
     """
     primary_arches = ["x86_64", "aarch64"]
-    url = ""
 
     session = get_requests_session()
 
-    # get coreos url
+    # get coreos url, that's a single request to the stream's metadata, oraculum isn't needed
     if version in config_data.STREAM_LIST:
-        try:
-            result = session.get("https://builds.coreos.fedoraproject.org/streams/%s.json" % version).json()
-        except (ConnectionError, IndexError, requests.exceptions.JSONDecodeError):
-            log.error("Failed to fetch the image.")
-            raise exceptions.TestcloudImageError
-        url = str(result["architectures"][arch]["artifacts"]["qemu"]["formats"]["qcow2.xz"]["disk"]["location"])
-        return url
+        return get_coreos_image_url(version, arch)
 
     # get Fedora Cloud url
     try:
-        oraculum_releases = session.get("https://packager-dashboard.fedoraproject.org/api/v1/releases").json()
+        oraculum_releases = parse_json(
+            session.get("https://packager-dashboard.fedoraproject.org/api/v1/releases", timeout=_RELEASES_TIMEOUT)
+        )
     except (ConnectionError, IndexError, requests.exceptions.JSONDecodeError):
         log.error("Couldn't fetch Fedora releases from oraculum...")
         raise exceptions.TestcloudImageError
 
-    if oraculum_releases["fedora"]["branched"] and version == str(oraculum_releases["fedora"]["branched"]):
+    fedora_releases = oraculum_releases["fedora"]
+    branched = fedora_releases["branched"]
+
+    if branched and version == str(branched):
         version = "branched"
 
-    if not oraculum_releases["fedora"]["branched"] and version == "branched":
+    if not branched and version == "branched":
         log.warning("Branched release currently doesn't exist, using rawhide...")
         version = "rawhide"
 
-    if version == str(oraculum_releases["fedora"]["rawhide"]):
+    if version == str(fedora_releases["rawhide"]):
         version = "rawhide"
 
-    if version == "qa-matrix":
-        if arch != "x86_64":
-            log.error("non-x86_64 architecture is not supported with Fedora qa-matrix.")
-            raise exceptions.TestcloudImageError
-        try:
-            # Never cache this one
-            nominated_response = requests.get("https://fedoraproject.org/wiki/Test_Results:Current_Installation_Test")
-            return str(re.findall(r"href=\"(.*.%s.qcow2)\"" % arch, nominated_response.text)[0])
-        except (ConnectionError, IndexError):
-            log.error("Couldn't fetch the current Fedora image from qa-matrix ..")
-            raise exceptions.TestcloudImageError
-
     if version == "rawhide" or version == "branched":
-        stamp = 0
         try:
-            releases = session.get("https://openqa.fedoraproject.org/nightlies.json").json()
-        except (ConnectionError, IndexError, requests.exceptions.JSONDecodeError):
+            releases = _get_fedora_nightlies()
+        except (ConnectionError, IndexError, requests.exceptions.RequestException):
             log.error("Failed to fetch the image.")
             raise exceptions.TestcloudImageError
-        for release in releases:
-            if release["arch"] == arch and release["subvariant"] == "Cloud_Base" and release["type"] == "qcow2":
-                if release["mtime"] > stamp and version in release["url"]:
-                    url = release["url"]
-                    stamp = release["mtime"]
-        if not url:
+        candidates = (
+            release
+            for release in releases
+            if release["arch"] == arch
+            and release["subvariant"] == "Cloud_Base"
+            and release["type"] == "qcow2"
+            and version in release["url"]
+        )
+        # The newest image wins, the first one listed on ties
+        newest = max(candidates, key=lambda release: release["mtime"], default=None)
+        if not newest:
             log.error("Failed to find/guess url for Fedora %s image" % version)
             raise exceptions.TestcloudImageError
-        return str(url)
+        return str(newest["url"])
 
     if version == "latest":
-        version = str(oraculum_releases["fedora"]["stable"])
+        version = str(fedora_releases["stable"])
 
     try:
-        releases = session.get("https://getfedora.org/releases.json").json()
-    except (ConnectionError, requests.exceptions.JSONDecodeError):
+        links = _get_fedora_release_links()
+    except (ConnectionError, requests.exceptions.RequestException):
         log.error("Couldn't fetch Fedora releases list...")
         raise exceptions.TestcloudImageError
 
-    url = ""
-    for release in releases:
-        if release["version"] == version and release["subvariant"] == "Cloud_Base" and release["link"].endswith(".qcow2"):
-            # There are links only to primary architecutres in releases.json... much fun
-            if arch in primary_arches and release["arch"] == arch:
-                url = release["link"]
-                break
-            elif arch not in primary_arches:
-                if release["arch"] == "x86_64":
-                    # Try to do a bit of dark magic (that would totally break in no time) to get meaningful url to secondary arch
-                    url = release["link"].replace("pub/fedora/linux/releases", "pub/fedora-secondary/releases").replace("x86_64", arch)
+    # There are links only to primary architecutres in releases.json... much fun
+    # The first link listed wins for primary arches, the last x86_64 one for the secondary ones
+    if arch in primary_arches:
+        url = links.get((version, arch), [""])[0]
+    else:
+        url = links.get((version, "x86_64"), [""])[-1]
+        if url:
+            # Try to do a bit of dark magic (that would totally break in no time) to get meaningful url to secondary arch
+            url = url.replace("pub/fedora/linux/releases", "pub/fedora-secondary/releases").replace("x86_64", arch)
 
     if not url:
         log.error("Expected format is 'fedora:XX' where XX is version number or 'latest', 'rawhide', 'branched' or 'qa-matrix'.")
         raise exceptions.TestcloudImageError
     return str(url)
+
+
+def get_fedora_image_url(version: str, arch: str) -> str:
+    """
+    Accepts string specifying desired fedora version, pssible values are:
+        - latest (translates to the latest Fedora GA) or XX (where XX is fedora release number)
+        - rawhide/branched (the latest successful nightly compose)
+        - qa-matrix (nominated compose for testing, can result it either some rawhide nigthly or branched nightly)
+    Returns url to Fedora Cloud qcow2
+    """
+    # The nominated compose can change at any time, so qa-matrix skips the cache
+    if version == "qa-matrix":
+        return _get_qa_matrix_image_url(arch)
+    return _get_fedora_image_url(version, arch)
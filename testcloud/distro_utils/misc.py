@@ -3,16 +3,76 @@
 # License: GPL-2.0+ <http://spdx.org/licenses/GPL-2.0+>
 # See the LICENSE file for more details on Licensing
 
+import functools
 import logging
 import re
 import requests
+import threading
+import time
 
 from testcloud import exceptions, config
 from packaging.version import Version
 
+try:
+    # Optional, parses the larger release lists (releases.json, nightlies.json) several times faster
+    import orjson as json
+except ImportError:
+    import json
+
 config_data = config.get_config()
 log = logging.getLogger("testcloud.util")
 
+# How long are the resolved image urls reused within a single process, in seconds
+RESOLVED_URL_TTL = 10 * 60
+
+# cache_clear() of every ttl_cache decorated function, see clear_url_caches()
+_ttl_cache_clears = []
+
+
+def ttl_cache(ttl):
+    """
+    Memoizes the results of the decorated function for ttl seconds, exceptions aren't cached
+    The cache can be dropped with cache_clear() on the decorated function, or with clear_url_caches() for all of them
+    """
+
+    def decorator(fn):
+        cache = {}
+        # The resolvers get called from several threads at once (util.get_image_urls)
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            cached = cache.get(key)
+            if cached and now - cached[0] < ttl:
+                return cached[1]
+            result = fn(*args, **kwargs)
+            with lock:
+                # Drop the expired entries so that the cache doesn't keep growing in long running processes
+                for expired in [cached_key for cached_key, (stamp, _) in cache.items() if now - stamp >= ttl]:
+                    del cache[expired]
+                cache[key] = (now, result)
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        _ttl_cache_clears.append(cache_clear)
+        return wrapper
+
+    return decorator
+
+
+def clear_url_caches():
+    """
+    Drops all the memoized image urls and release lists, call it when the urls in the config get changed on the fly
+    """
+    for cache_clear in _ttl_cache_clears:
+        cache_clear()
+
 
 def parse_latest_qcow(rule: str, url: str) -> str:
     session = get_requests_session()
@@ -26,7 +86,38 @@ def parse_latest_qcow(rule: str, url: str) -> str:
         raise exceptions.TestcloudImageError
 
 
+def parse_json(response):
+    """
+    Returns the decoded JSON body of a response, raising requests.exceptions.JSONDecodeError on invalid content
+    just like response.json() does
+    """
+    try:
+        return json.loads(response.content)
+    except ValueError as e:
+        # Both json and orjson raise (a subclass of) json.JSONDecodeError, except for undecodable bytes
+        raise requests.exceptions.JSONDecodeError(getattr(e, "msg", str(e)), getattr(e, "doc", ""), getattr(e, "pos", 0)) from e
+
+
+# requests doesn't document sessions as thread-safe and the resolvers run in worker threads
+# (util.get_image_urls), so each thread gets sessions of its own
+_thread_sessions = threading.local()
+
+
 def get_requests_session():
+    """
+    Returns the requests session for resolving image urls, shared by all the resolvers in the calling thread
+    so that repeated lookups reuse its pooled connections (and the opened cache)
+    """
+    sessions = getattr(_thread_sessions, "sessions", None)
+    if sessions is None:
+        sessions = _thread_sessions.sessions = {}
+    # DATA_DIR can be changed on the fly, which moves the cache too
+    if config_data.DATA_DIR not in sessions:
+        sessions[config_data.DATA_DIR] = _create_requests_session(config_data.DATA_DIR)
+    return sessions[config_data.DATA_DIR]
+
+
+def _create_requests_session(data_dir):
     try:
         assert config_data.CACHE_IMAGES
         import requests_cache
@@ -35,7 +126,7 @@ def get_requests_session():
 
         log.debug("Using local image url cache...")
         return requests_cache.CachedSession(
-            cache_name="{}/testcloud_image_resolve_cache".format(config_data.DATA_DIR),
+            cache_name="{}/testcloud_image_resolve_cache".format(data_dir),
             backend="sqlite",
             stale_if_error=True,
             expire_after=config_data.TRUST_DEADLINE * 60 * 60 * 24,
@@ -8,7 +8,7 @@ import requests
 
 from testcloud import config
 from testcloud import exceptions
-from testcloud.distro_utils.misc import get_requests_session
+from testcloud.distro_utils.misc import RESOLVED_URL_TTL, get_requests_session, parse_json, ttl_cache
 
 log = logging.getLogger("testcloud.util")
 config_data = config.get_config()
@@ -18,17 +18,30 @@ def get_ubuntu_releases() -> dict:
     session = get_requests_session()
 
     try:
-        releases_resp = session.get(config_data.UBUNTU_RELEASES_API).json()
+        releases_resp = parse_json(session.get(config_data.UBUNTU_RELEASES_API))
     except (ConnectionError, IndexError, requests.exceptions.JSONDecodeError):
         log.error("Failed to fetch Ubuntu releases list.")
         raise exceptions.TestcloudImageError
 
-    return {
-        "latest": [entry["name"] for entry in releases_resp["entries"] if entry["active"] and "Current Stable Release" in entry["status"]][0],
-        "entries": [entry["name"] for entry in releases_resp["entries"] if entry["active"] and float(entry["version"]) >= 20],
-    }
+    latest = None
+    entries = []
+    for entry in releases_resp["entries"]:
+        if not entry["active"]:
+            continue
+        # The first current stable release listed is the latest one
+        if latest is None and "Current Stable Release" in entry["status"]:
+            latest = entry["name"]
+        if float(entry["version"]) >= 20:
+            entries.append(entry["name"])
+
+    if latest is None:
+        log.error("Failed to find the current stable Ubuntu release.")
+        raise exceptions.TestcloudImageError
+
+    return {"latest": latest, "entries": entries}
 
 
+@ttl_cache(RESOLVED_URL_TTL)
 def get_ubuntu_image_url(version: str, arch: str) -> str:
     arch_map = {"x86_64": "amd64", "aarch64": "arm64", "ppc64le": "ppc64el", "s390x": "s390x"}
 
@@ -1,6 +1,7 @@
 from typing import Optional
+import itertools
 import string
-import xml.dom.minidom
+import xml.etree.ElementTree as ET
 import os
 import uuid
 import platform
@@ -12,6 +13,9 @@ from testcloud import image
 
 config_data = config.get_config()
 
+# Keep the qemu: prefix when the domain XML is serialized
+ET.register_namespace("qemu", "http://libvirt.org/schemas/domain/qemu/1.0")
+
 
 class ArchitectureConfiguration:
     qemu: str
@@ -153,11 +157,10 @@ class S390xArchitectureConfiguration(ArchitectureConfiguration):
 
 def storage_device_name_generator():
     prefix = "vd"
-    for i in range(26):
-        yield prefix + string.ascii_lowercase[i]
-
-
-storage_device_name = storage_device_name_generator()
+    # vda ... vdz, then vdaa, vdab, ... the same way the kernel names them
+    for length in itertools.count(1):
+        for letters in itertools.product(string.ascii_lowercase, repeat=length):
+            yield prefix + "".join(letters)
 
 
 class StorageDeviceConfiguration:
@@ -174,7 +177,7 @@ class StorageDeviceConfiguration:
 class RawStorageDevice(StorageDeviceConfiguration):
     def __init__(self, path) -> None:
         self.path = path
-        self.host_device_path = next(storage_device_name)
+        self.host_device_path = ""
 
     def generate(self):
         return """
@@ -194,7 +197,7 @@ class QCow2StorageDevice(StorageDeviceConfiguration):
         self.path = path
         self.size = size
         self.serial_str = serial_str
-        self.host_device_path = next(storage_device_name)
+        self.host_device_path = ""
 
     def generate(self):
         return """
@@ -312,6 +315,10 @@ class IOMMUConfiguration:
         )
 
 
+# Usable qemu binary for each of the architectures' qemu, see DomainConfiguration.get_emulator
+_emulators = {}
+
+
 class DomainConfiguration:
     name: str
     cpu_count: int
@@ -360,6 +367,9 @@ class DomainConfiguration:
         """
 
     def generate_storage_devices(self) -> str:
+        # Disks are named after their position in this domain, not in the whole process
+        for device, device_name in zip(self.storage_devices, storage_device_name_generator()):
+            device.host_device_path = device_name
         return "\n".join([device.generate() for device in self.storage_devices])
 
     def generate_network_devices(self) -> str:
@@ -369,6 +379,9 @@ class DomainConfiguration:
 
     def get_emulator(self) -> str:
         assert self.system_architecture is not None
+        # The installed qemu binaries don't come and go while we run
+        if self.system_architecture.qemu in _emulators:
+            return _emulators[self.system_architecture.qemu]
         qemu_paths = [
             # Try to query usable qemu binaries for desired architecture
             "/usr/bin/" + self.system_architecture.qemu,
@@ -379,6 +392,7 @@ class DomainConfiguration:
         ]
         for path in qemu_paths:
             if os.path.exists(path):
+                _emulators[self.system_architecture.qemu] = path
                 return path
 
         raise TestcloudInstanceError("No usable qemu binary exist, tried: %s" % qemu_paths)
@@ -466,8 +480,15 @@ class DomainConfiguration:
             qemu_args=self.get_qemu_args(),
             qemu_envs=self.get_qemu_envs(),
         )
-        almost_pretty_xml = xml.dom.minidom.parseString(domain_xml).toprettyxml(indent="  ")
-        return os.linesep.join([s for s in almost_pretty_xml.splitlines() if s.strip()])
+        # ElementTree builds the tree in C rather than minidom's pure Python DOM
+        domain = ET.fromstring(domain_xml)
+        # indent() only replaces the whitespace around child elements, empty elements (e.g. qemu:commandline
+        # without any args) would keep the template's blank lines
+        for element in domain.iter():
+            if element.text and not element.text.strip():
+                element.text = None
+        ET.indent(domain, space="  ")
+        return ET.tostring(domain, encoding="unicode")
 
 
 def _get_default_domain_conf(
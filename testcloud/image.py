@@ -203,12 +203,13 @@ class Image(object):
                 try:
                     file_size = int(u.headers["content-length"])
                 except KeyError:
-                    log.warn("Unknown download size.")
+                    log.warning("Unknown download size.")
                     file_size = -1
 
                 log.info("Downloading {0} ({1} bytes)".format(local_path, file_size))
                 bytes_downloaded = 0
-                block_size = 4096
+                # Large blocks keep the per-chunk overhead (and progress output) low for multi-GB images
+                block_size = 1024 * 1024
                 percent_last = 0
 
                 # FIXME - there _must_ be a better way... Not touching this code though...
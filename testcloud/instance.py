@@ -7,6 +7,7 @@
 Representation of a Testcloud spawned (or to-be-spawned) virtual machine
 """
 
+import atexit
 import os
 
 import subprocess
@@ -44,6 +45,32 @@ DOMAIN_STATUS_ENUM = {
 }
 
 
+#: read-only libvirt connections reused by the domain queries, keyed by connection uri
+_ro_connections = {}
+
+
+def _get_ro_connection(connection):
+    """Get a read-only connection to the hypervisor, opening it only when there is no live one yet.
+
+    :param str connection: name of libvirt connection uri
+    """
+
+    conn = _ro_connections.get(connection)
+    if conn is None or not conn.isAlive():
+        conn = _ro_connections[connection] = libvirt.openReadOnly(connection)
+    return conn
+
+
+@atexit.register
+def _close_ro_connections():
+    for conn in _ro_connections.values():
+        try:
+            conn.close()
+        except libvirt.libvirtError:
+            pass
+    _ro_connections.clear()
+
+
 def _list_instances():
     """List existing instances currently known to testcloud
 
@@ -52,19 +79,20 @@ def _list_instances():
 
     instance_list = []
 
-    instance_dir = os.listdir("{}/instances".format(config_data.DATA_DIR))
-    for dir in instance_dir:
+    instances_path = "{}/instances".format(config_data.DATA_DIR)
+    for dir in os.listdir(instances_path):
         instance_details = {}
         instance_details["name"] = dir
+        instance_path = os.path.join(instances_path, dir)
         try:
-            with open("{}/instances/{}/ip".format(config_data.DATA_DIR, dir), "r") as inst:
+            with open(os.path.join(instance_path, "ip"), "r") as inst:
                 instance_details["ip"] = inst.readline().strip()
 
         except IOError:
             instance_details["ip"] = None
 
         try:
-            with open("{}/instances/{}/port".format(config_data.DATA_DIR, dir), "r") as inst:
+            with open(os.path.join(instance_path, "port"), "r") as inst:
                 instance_details["port"] = inst.readline().strip()
 
         except IOError:
@@ -84,7 +112,7 @@ def _list_domains(connection):
     """
 
     domains = {}
-    conn = libvirt.openReadOnly(connection)
+    conn = _get_ro_connection(connection)
     for domain in conn.listAllDomains():
         try:
             # the libvirt docs seem to indicate that the second int is for state
@@ -110,7 +138,7 @@ def _find_domain(name, connection):
     :rtype: str or None
     """
 
-    conn = libvirt.openReadOnly(connection)
+    conn = _get_ro_connection(connection)
     try:
         domain = conn.lookupByName(name)
         return DOMAIN_STATUS_ENUM[domain.state()[0]]
@@ -177,7 +205,7 @@ def list_instances(connection=None):
 
     for instance in all_instances:
         if instance["name"] not in domains.keys():
-            log.warn("{} is not registered, might want to delete it via 'testcloud instance clean'.".format(instance["name"]))
+            log.warning("{} is not registered, might want to delete it via 'testcloud instance clean'.".format(instance["name"]))
             instance["state"] = "de-sync"
 
             instances.append(instance)
@@ -547,7 +575,7 @@ class Instance(object):
     def boot(self, timeout=config_data.BOOT_TIMEOUT):
         """Deprecated alias for :py:meth:`start`"""
 
-        log.warn("instance.boot has been depricated and will be removed in a " "future release, use instance.start instead")
+        log.warning("instance.boot has been depricated and will be removed in a " "future release, use instance.start instead")
 
         self.start(timeout)
 
@@ -698,7 +726,7 @@ class Instance(object):
             except libvirt.libvirtError as e:
                 if e.get_error_code() == libvirt.VIR_ERR_SYSTEM_ERROR:
                     # host is busy, see https://bugzilla.redhat.com/1205647#c13
-                    log.warn("Host is busy, retrying to stop the instance {}".format(self.name))
+                    log.warning("Host is busy, retrying to stop the instance {}".format(self.name))
                 elif e.get_error_code() == libvirt.VIR_ERR_OPERATION_INVALID:
                     log.debug("Domain stopped between attempts, ignoring error: {}".format(e))
                     return
@@ -731,7 +759,7 @@ class Instance(object):
             log.debug("Unregistering instance from libvirt.")
             self._get_domain().undefineFlags(libvirt.VIR_DOMAIN_UNDEFINE_NVRAM)
         else:
-            log.warn(
+            log.warning(
                 'Instance "{}" not found in libvirt "{}". Was it removed already? Should '
                 "you have used a different connection?".format(self.name, self.connection)
             )
@@ -811,11 +839,11 @@ class Instance(object):
             time.sleep(sleep_interval)
 
         msg = "Couldn't find IP for %s before %s second timeout" % (domain, timeout)
-        log.warn(msg)
+        log.warning(msg)
         raise TestcloudInstanceError(msg)
 
     def prepare_vagrant_init(self, prepare_command):
-        log.warn("Support for images without cloud-init in testcloud is not reliable. You have been warned...")
+        log.warning("Support for images without cloud-init in testcloud is not reliable. You have been warned...")
         if self.connection == "qemu:///session":
             log.info("Giving the VM some time (%s seconds) to boot up..." % config_data.VAGRANT_USER_SESSION_WAIT)
             time.sleep(config_data.VAGRANT_USER_SESSION_WAIT)
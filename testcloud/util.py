@@ -7,6 +7,7 @@
 This module contains helper functions for testcloud.
 """
 
+import functools
 import logging
 import random
 import requests
@@ -16,6 +17,7 @@ import os
 import fcntl
 import errno
 import socket
+from concurrent.futures import ThreadPoolExecutor
 
 from testcloud import config
 from testcloud import exceptions
@@ -126,33 +128,42 @@ def verify_url(url: str) -> str:
         raise exceptions.TestcloudImageError
 
 
-def get_image_url(distro_str: str, arch="x86_64", verify=False, additional_handles={}) -> str:
-    distro_str = distro_str.lower()
-    COREOS = "|".join(d for d in config_data.STREAM_LIST)
+@functools.lru_cache(maxsize=None)
+def _supported_handles(stream_list: tuple) -> dict:
+    """
+    Returns the url handles with their patterns compiled, the CoreOS ones match the streams in stream_list
+    """
+    coreos = "|".join(stream_list)
 
     # Position of handles affects program flow
-    SUPPORTED_HANDLES = {
-        "fedora": {"re": r"^f(edora)?(-|:)?(\d+|rawhide|qa-matrix|branched)?$", "fn": get_fedora_image_url},
-        "fedora-coreos": {"re": r"^f(edora-coreos)?(-|:)?(%s)?$" % COREOS, "fn": get_coreos_image_url},
-        "fedora-openstack": {"re": r"^f(edora-openstack)?(-|:)?(%s)?$" % COREOS, "fn": get_fedora_openstack_image_url},
-        "centos-stream": {"re": r"^c(entos-stream)?(-|:)?(\d+)?$", "fn": get_centos_stream_image_url},
-        "coreos": {"re": r"^co(reos)?(-|:)?(%s)?$" % COREOS, "fn": get_coreos_image_url},
-        "centos": {"re": r"^c(entos)?(-|:)?(\d+)?$", "fn": get_centos_image_url},
-        "ubuntu": {"re": r"^u(buntu)?([:-]([a-z]+|\d+))?$", "fn": get_ubuntu_image_url},
-        "debian": {"re": r"^d(ebian)?(-|:)?(\d+)?$", "fn": get_debian_image_url},
-        "alma": {"re": r"^a(lma)?(-|:)?(\d+)?$", "fn": get_alma_image_url},
-        "rocky": {"re": r"^r(ocky)?(-|:)?(\d+)?$", "fn": get_rocky_image_url},
-        "oracle": {"re": r"^o(racle)?(-|:)?(\d+)?$", "fn": get_oracle_image_url},
+    return {
+        "fedora": {"re": re.compile(r"^f(edora)?(-|:)?(\d+|rawhide|qa-matrix|branched)?$"), "fn": get_fedora_image_url},
+        "fedora-coreos": {"re": re.compile(r"^f(edora-coreos)?(-|:)?(%s)?$" % coreos), "fn": get_coreos_image_url},
+        "fedora-openstack": {"re": re.compile(r"^f(edora-openstack)?(-|:)?(%s)?$" % coreos), "fn": get_fedora_openstack_image_url},
+        "centos-stream": {"re": re.compile(r"^c(entos-stream)?(-|:)?(\d+)?$"), "fn": get_centos_stream_image_url},
+        "coreos": {"re": re.compile(r"^co(reos)?(-|:)?(%s)?$" % coreos), "fn": get_coreos_image_url},
+        "centos": {"re": re.compile(r"^c(entos)?(-|:)?(\d+)?$"), "fn": get_centos_image_url},
+        "ubuntu": {"re": re.compile(r"^u(buntu)?([:-]([a-z]+|\d+))?$"), "fn": get_ubuntu_image_url},
+        "debian": {"re": re.compile(r"^d(ebian)?(-|:)?(\d+)?$"), "fn": get_debian_image_url},
+        "alma": {"re": re.compile(r"^a(lma)?(-|:)?(\d+)?$"), "fn": get_alma_image_url},
+        "rocky": {"re": re.compile(r"^r(ocky)?(-|:)?(\d+)?$"), "fn": get_rocky_image_url},
+        "oracle": {"re": re.compile(r"^o(racle)?(-|:)?(\d+)?$"), "fn": get_oracle_image_url},
     }
 
-    MERGED_HANDLES = {**SUPPORTED_HANDLES, **additional_handles}
+
+def get_image_url(distro_str: str, arch="x86_64", verify=False, additional_handles={}) -> str:
+    distro_str = distro_str.lower()
+
+    # STREAM_LIST can be changed on the fly, the patterns get compiled once for each of its values
+    supported_handles = _supported_handles(tuple(config_data.STREAM_LIST))
+    MERGED_HANDLES = {**supported_handles, **additional_handles} if additional_handles else supported_handles
     HELP_LIST = (", ").join(MERGED_HANDLES.keys())
 
     if not distro_str:
         log.error("No url handle (distro or distro-version) passed, supported handles are: %s" % HELP_LIST)
         raise exceptions.TestcloudImageError
 
-    # regexp matching
+    # regexp matching, additional handles may come with plain string patterns
     for _, distro in MERGED_HANDLES.items():
         match = re.match(distro["re"], distro_str)
         if match:
@@ -162,6 +173,21 @@ def get_image_url(distro_str: str, arch="x86_64", verify=False, additional_handl
     raise exceptions.TestcloudImageError
 
 
+def get_image_urls(distro_strs, arch="x86_64", verify=False, additional_handles={}) -> dict:
+    """
+    Resolves several url handles at once, see get_image_url
+    The lookups are mostly waiting on the network, so they are done in parallel
+    Returns dict mapping each of the handles to its url, raises TestcloudImageError if any of them fails
+    """
+    distro_strs = list(dict.fromkeys(distro_strs))
+    if not distro_strs:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(len(distro_strs), 10)) as executor:
+        urls = executor.map(lambda distro_str: get_image_url(distro_str, arch, verify, additional_handles), distro_strs)
+        return dict(zip(distro_strs, urls))
+
+
 class Filelock(object):
     def __init__(self, timeout=25, wait_time=0.5):
         # We need to define the lock_path here so it won't get overwritten by importing tc's config in this file